@@ -1,6 +1,8 @@
 import os
+import threading
+from array import array
+from bisect import bisect_left, insort
 from collections import deque
-from statistics import median
 
 BYPASS = os.getenv("DRIFT_FILTER_BYPASS","0") == "1"
 
@@ -10,34 +12,77 @@ class DriftFilter:
         if BYPASS:
             return
         if median_n % 2 == 0: median_n += 1
-        self.buf = deque(maxlen=median_n)
+        # Ring of the last median_n inputs as unboxed doubles; _n counts writes.
+        self.median_n = median_n
+        self.buf = array("d", [0.0]) * median_n
+        self._n = 0
+        self._sorted = []  # same samples as buf, kept in order for the median
         self.ema = None
         self.alpha = ema_alpha
+        self._keep = 1.0 - ema_alpha
         self.zero_gate = float(zero_gate_g)
         self.zero_var  = float(zero_var_g)
         self.zero_rate = float(zero_rate_gps)
         self.sample_hz = sample_hz
         self.offset = 0.0
-        self.recent = deque(maxlen=max(10, int(sample_hz*1.5)))
+        # Sliding max/min of recent outputs as monotonic deques of (value, index).
+        self.recent_n = max(10, int(sample_hz*1.5))
+        self._i = 0
+        self._max_dq = deque()
+        self._min_dq = deque()
+        # update() runs from concurrent threadpool requests; the ring, the
+        # sorted copy and the deques must move together.
+        self._lock = threading.Lock()
 
     def update(self, g):
         if BYPASS:
             return float(g)
-        g = float(g) - self.offset
-        self.buf.append(g)
-        m = median(self.buf)
-        self.ema = m if self.ema is None else (self.alpha*m + (1.0-self.alpha)*self.ema)
-        y = self.ema
-        self.recent.append(y)
-        if len(self.recent) >= self.recent.maxlen:
-            span = max(self.recent) - min(self.recent)
-            if abs(y) < self.zero_gate and span < self.zero_var:
-                step = self.zero_rate * (-1.0 if y>0 else (1.0 if y<0 else 0.0))
-                self.offset += step
-                y -= step
-        return y
+        with self._lock:
+            g = float(g) - self.offset
+            srt = self._sorted
+            k = self._n
+            self._n = k + 1
+            slot = k % self.median_n
+            if k >= self.median_n:
+                del srt[bisect_left(srt, self.buf[slot])]
+            self.buf[slot] = g
+            insort(srt, g)
+            n = len(srt)
+            mid = n // 2
+            m = srt[mid] if n & 1 else (srt[mid - 1] + srt[mid]) / 2.0
+            ema = self.ema
+            y = self.ema = m if ema is None else (self.alpha*m + self._keep*ema)
+            i = self._i
+            self._i = i + 1
+            expired = i - self.recent_n
+            max_dq = self._max_dq
+            while max_dq and max_dq[-1][0] <= y:
+                max_dq.pop()
+            max_dq.append((y, i))
+            if max_dq[0][1] <= expired:
+                max_dq.popleft()
+            min_dq = self._min_dq
+            while min_dq and min_dq[-1][0] >= y:
+                min_dq.pop()
+            min_dq.append((y, i))
+            if min_dq[0][1] <= expired:
+                min_dq.popleft()
+            if i + 1 >= self.recent_n:
+                span = max_dq[0][0] - min_dq[0][0]
+                if span < self.zero_var and -self.zero_gate < y < self.zero_gate and y:
+                    step = -self.zero_rate if y > 0 else self.zero_rate
+                    self.offset += step
+                    y -= step
+            return y
 
     def reset(self):
         if BYPASS:
             return
-        self.buf.clear(); self.ema=None; self.recent.clear(); self.offset=0.0
+        with self._lock:
+            self._n = 0
+            self._sorted.clear()
+            self.ema = None
+            self.offset = 0.0
+            self._i = 0
+            self._max_dq.clear()
+            self._min_dq.clear()
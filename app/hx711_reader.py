@@ -1,11 +1,16 @@
 """Scale reader for Brecknell B140 over RS-232."""
+import math
 import os
 import re
+import select
 import threading
 import time
-from collections import deque
-from datetime import datetime
-from statistics import median, pstdev
+from array import array
+from bisect import bisect_left, insort
+from collections import deque, namedtuple
+from collections.abc import Callable
+from functools import lru_cache
+from itertools import islice
 from typing import Any
 
 import serial
@@ -37,6 +42,65 @@ def _env_int(name: str, default: int) -> int:
         return int(default)
 
 
+_DEFAULT_TERMINATOR = b"\r"
+
+
+@lru_cache(maxsize=8)
+def _coerce_terminator(value: str | None) -> bytes:
+    """Turn an escaped env value such as ``\\r\\n`` into terminator bytes."""
+    if not value:
+        return _DEFAULT_TERMINATOR
+    decoded = value.encode("utf-8", errors="ignore").decode("unicode_escape")
+    if not decoded:
+        return _DEFAULT_TERMINATOR
+    return decoded.encode("utf-8", errors="ignore")
+
+
+class _LogEntry:
+    """One serial-log row; dicts are only built when the API asks for rows."""
+
+    __slots__ = ("event", "grams", "parsed", "raw", "raw_counts", "stable_hint", "ts")
+
+    def __init__(
+        self,
+        ts: str | None,
+        raw: str,
+        parsed: bool,
+        grams: float | None,
+        raw_counts: int | None,
+        stable_hint: bool | None,
+        event: str | None,
+    ) -> None:
+        self.ts = ts
+        self.raw = raw
+        self.parsed = parsed
+        self.grams = grams
+        self.raw_counts = raw_counts
+        self.stable_hint = stable_hint
+        self.event = event
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "ts": self.ts,
+            "raw": self.raw,
+            "parsed": self.parsed,
+            "grams": self.grams,
+            "raw_counts": self.raw_counts,
+            "stable_hint": self.stable_hint,
+            "event": self.event,
+        }
+
+
+# Immutable snapshot of the newest reading. _update swaps it in with a single
+# attribute store, so readers never see a half-written value and need no lock.
+Latest = namedtuple("Latest", "g stable raw")
+# inv_scale is 1 / scale_factor; identity marks a calibration that maps parsed
+# grams back onto themselves, letting _update skip the counts round-trip.
+CalibrationState = namedtuple(
+    "CalibrationState", "zero_offset scale_factor scale_sign inv_scale identity"
+)
+
+
 class ADCNotReadyError(RuntimeError):
     """Raised when the serial scale does not provide fresh data in time."""
 
@@ -53,21 +117,31 @@ class ScaleReader:
     implementation so the rest of the application can remain unchanged.
     """
 
-    _LINE_SPLIT_RE = re.compile(r"[,\s]+")
+    _TOKEN_RE = re.compile(r"[^,\s]+")
     _NUMBER_PATTERN = r"[-+]?(?:\d+(?:\.\d+)?|\.\d+)"
+    _UNIT_PATTERN = r"KG|KGS?|KILOGRAMS?|LB|LBS?|POUNDS?|OZ|OZS?|OUNCES?|G|GRAMS?"
     _NUMBER_RE = re.compile(_NUMBER_PATTERN)
     _NUMBER_WITH_UNIT_RE = re.compile(
-        rf"({_NUMBER_PATTERN})\s*(KG|KGS?|KILOGRAMS?|LB|LBS?|POUNDS?|OZ|OZS?|OUNCES?|G|GRAMS?)",
+        rf"({_NUMBER_PATTERN})\s*({_UNIT_PATTERN})",
         re.IGNORECASE,
     )
-    _NET_VALUE_RE = re.compile(
-        rf"\bNETT?(?:\s*(?:WEIGHT|WT\.?))?\b[:=\s]*({_NUMBER_PATTERN})(?:\s*(KG|KGS?|KILOGRAMS?|LB|LBS?|POUNDS?|OZ|OZS?|OUNCES?|G|GRAMS?))?",
-        re.IGNORECASE,
-    )
-    _VERBOSE_FIELD_RE = re.compile(
-        r"\b(DATE|TIME|GROSS|TARE|MERCHANDISE|PIECE|TOTAL|COUNT|ITEM)\b",
+    # Net values and the other verbose ticket fields in a single scan; a Net
+    # value wins wherever it appears, any other field marks a non-live line.
+    _TICKET_FIELD_RE = re.compile(
+        rf"(?P<net>\bNETT?(?:\s*(?:WEIGHT|WT\.?))?\b[:=\s]*(?P<net_value>{_NUMBER_PATTERN})(?:\s*(?P<net_unit>{_UNIT_PATTERN}))?)"
+        r"|(?P<verbose>\b(?:DATE|TIME|GROSS|TARE|MERCHANDISE|PIECE|TOTAL|COUNT|ITEM)\b)",
         re.IGNORECASE,
     )
+    _B140_STATUS = frozenset({b"ST", b"US"})
+    _B140_MODES = frozenset({b"GS", b"NT"})
+    _B140_UNITS = frozenset({b"kg", b"lb", b"oz"})
+    _B140_NUMBER_CHARS = frozenset(b"0123456789.+-")
+    _GRAM_TOKENS = frozenset({"G", "GRAM", "GRAMS"})
+    _POUND_TOKENS = frozenset({"LB", "LBS", "POUND", "POUNDS"})
+    _OUNCE_TOKENS = frozenset({"OZ", "OZS", "OUNCE", "OUNCES"})
+    # Cheap substring prefilter: live B140 frames carry none of these, so the
+    # ticket regex only runs on printout lines.
+    _TICKET_MARKERS = ("NET", "DATE", "TIME", "GROSS", "TARE", "MERCHANDISE", "PIECE", "TOTAL", "COUNT", "ITEM")
 
     def __init__(
         self,
@@ -87,6 +161,13 @@ class ScaleReader:
         )
         kg_factor = _env_float("SCALE_KG_TO_GRAMS", 1000.0)
         self.kg_to_grams = kg_factor if kg_factor > 0 else 100.0
+        # Grams per unit, keyed by every lower-case spelling the parser accepts.
+        self._unit_factors: dict[str, float] = {
+            **dict.fromkeys(("kg", "kgs", "kilogram", "kilograms"), self.kg_to_grams),
+            **dict.fromkeys(("lb", "lbs", "pound", "pounds"), 453.59237),
+            **dict.fromkeys(("oz", "ozs", "ounce", "ounces"), 28.349523125),
+            **dict.fromkeys(("g", "gram", "grams"), 1.0),
+        }
         self.net_default_unit = self._coerce_net_unit(os.getenv("SCALE_NET_UNIT", "auto"))
 
         self.bytesize = self._coerce_bytesize(os.getenv("SCALE_BYTESIZE"))
@@ -98,59 +179,105 @@ class ScaleReader:
         self.set_dtr = _env_bool("SCALE_FORCE_DTR", True)
         self.set_rts = _env_bool("SCALE_FORCE_RTS", True)
 
-        self.frame_terminator = self._coerce_terminator(
-            os.getenv("SCALE_FRAME_TERMINATOR", "\\r"),
-        )
+        self.frame_terminator = _coerce_terminator(os.getenv("SCALE_FRAME_TERMINATOR"))
         self.frame_max_bytes = _env_int("SCALE_FRAME_MAX_BYTES", 64)
         if self.frame_max_bytes <= 0:
             self.frame_max_bytes = 64
 
         self.alpha = alpha
-        self.window = deque(maxlen=window)
+        # Fixed ring of unboxed doubles; _window_count says which slot is oldest.
+        self._window_size = max(1, window)
+        self._window = array("d", [0.0]) * self._window_size
+        # Sorted copy of the window plus running sums so the median and the
+        # spread are updated per sample instead of recomputed from scratch.
+        self._window_sorted: list[float] = []
+        self._window_sum = 0.0
+        self._window_sumsq = 0.0
+        self._window_count = 0
+        # Fewest samples before the spread test may call a reading stable.
+        self._stable_min_n = max(5, self._window_size // 2)
         self.display_precision = display_precision
 
         self._serial: serial.Serial | None = None
         self._serial_lock = threading.Lock()
-        self._state_lock = threading.RLock()
 
-        self._zero_offset = 0
-        self._scale_factor = float(self.native_counts_per_gram)
-        self._scale_sign = 1
+        # Replaced as a whole by set_calibration so the reader thread can read it
+        # without a lock.
+        scale_factor = float(self.native_counts_per_gram)
+        inv_scale = 1.0 / scale_factor if abs(scale_factor) > 1e-9 else 0.0
+        self._calibration = CalibrationState(0, scale_factor, 1, inv_scale, True)
 
         self.ema: float | None = None
         self.running = False
-        self.latest = dict(g=0.0, stable=False, raw=0)
-
-        self._last_raw_counts: int | None = None
-        self._last_update_ts: float = 0.0
-        self._raw_log: deque[dict[str, Any]] = deque(maxlen=2000)
+        # Set by stop(); every sleep in the reader thread waits on it instead.
+        self._stop_event = threading.Event()
+        # Serial errors and frames that failed to parse with an exception, for
+        # /api/health; keeps counting across reconnects.
+        self.bad_reads = 0
+        self.latest = Latest(0.0, False, 0)
+
+        # (monotonic ts, raw counts) of recent readings for read_raw_avg.
+        self._recent_raw: deque[tuple[float, int]] = deque(maxlen=64)
+        self._listeners: list[Callable[[Latest], None]] = []
+        self._raw_log: deque[_LogEntry] = deque(maxlen=2000)
+        self._ts_cache: tuple[int, str] = (-1, "")
         self._last_data_ts: float | None = None
+        self._rxbuf = bytearray()
+        # Self-pipe so stop() can wake a reader blocked in select().
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._poller: select.poll | None = None
+        self._serial_fd: int | None = None
+        self._poll_timeout_ms = max(0, int(self.timeout * 1000))
+
+    @property
+    def alpha(self) -> float:
+        return self._alpha
+
+    @alpha.setter
+    def alpha(self, value: float) -> None:
+        # Both EMA weights are stored so _update does no arithmetic to get them.
+        self._alpha = value
+        self._ema_weights = (value, 1 - value)
+
+    @property
+    def display_precision(self) -> float:
+        return self._display_precision
+
+    @display_precision.setter
+    def display_precision(self, value: float) -> None:
+        self._display_precision = value
+        # Cached for _update; a non-positive step falls back to 0.1 g.
+        self._inv_precision = 1.0 / value if value > 0 else 10.0
 
     # ------------------------------------------------------------------
     # Calibration helpers (maintain HX711-compatible API)
     def set_calibration(self, zero_offset: int, scale_factor: float) -> None:
-        with self._state_lock:
-            self._zero_offset = int(zero_offset)
-            self._scale_sign = 1 if scale_factor >= 0 else -1
-            self._scale_factor = float(abs(scale_factor) if abs(scale_factor) > 1e-9 else 1.0)
-
-    def get_calibration(self) -> dict:
-        with self._state_lock:
-            return dict(
-                zero_offset=self._zero_offset,
-                scale_factor=self._scale_factor,
-                scale_sign=self._scale_sign,
-            )
+        sign = 1 if scale_factor >= 0 else -1
+        factor = float(abs(scale_factor) if abs(scale_factor) > 1e-9 else 1.0)
+        zero = int(zero_offset)
+        identity = zero == 0 and sign == 1 and factor == self.native_counts_per_gram
+        self._calibration = CalibrationState(zero, factor, sign, 1.0 / factor, identity)
+
+    def get_calibration(self) -> CalibrationState:
+        return self._calibration
 
     # ------------------------------------------------------------------
     def start(self, hz: int | None = None) -> None:
         if self.running:
             return
         self.running = True
+        self._stop_event.clear()
         threading.Thread(target=self._loop, name="ScaleReader", daemon=True).start()
 
     def stop(self) -> None:
         self.running = False
+        self._stop_event.set()
+        try:
+            os.write(self._wake_w, b"x")
+        except OSError:
+            pass  # pipe already full: the reader is awake anyway
         with self._serial_lock:
             if self._serial and self._serial.is_open:
                 try:
@@ -158,91 +285,233 @@ class ScaleReader:
                 except Exception:
                     pass
             self._serial = None
+            self._poller = None
 
     # ------------------------------------------------------------------
     def read_latest(self) -> dict:
-        with self._state_lock:
-            return dict(self.latest)
+        latest = self.latest
+        return {
+            "g": latest.g,
+            "stable": latest.stable,
+            "raw": latest.raw,
+            "bad_reads": self.bad_reads,
+        }
+
+    def add_listener(self, callback: Callable[[Latest], None]) -> None:
+        """Call ``callback(latest)`` on the reader thread after every new reading.
+
+        Callbacks must be quick and must not block; hand work off to another
+        thread or event loop instead.
+        """
+        self._listeners.append(callback)
 
     def read_raw_avg(self, n: int = 12) -> int:
-        with self._state_lock:
-            raw = self._last_raw_counts
-            ts = self._last_update_ts
-        if raw is None or (time.time() - ts) > 1.0:
+        """Trimmed mean of up to ``n`` raw readings from the last second.
+
+        The indicator paces its own output, so nothing is sampled here: the
+        newest readings the reader thread already saw are averaged with the
+        top and bottom 10% dropped, so one bad frame cannot skew a tare.
+        """
+        cutoff = time.monotonic() - 1.0
+        # list(deque) copies in one C call, so the reader thread cannot append
+        # mid-copy; filtering the copy afterwards is then safe without a lock.
+        tail = list(self._recent_raw)[-max(1, int(n)):]
+        recent = [raw for ts, raw in tail if ts >= cutoff]
+        if not recent:
             raise ADCNotReadyError("Scale did not provide fresh data")
-        return int(raw)
+        recent.sort()
+        trim = len(recent) // 10
+        if trim:
+            recent = recent[trim:-trim]
+        return round(sum(recent) / len(recent))
 
     def get_serial_log(self, limit: int = 200) -> list[dict[str, Any]]:
         limit = max(1, min(int(limit), self._raw_log.maxlen or 2000))
-        with self._state_lock:
-            items = list(self._raw_log)[-limit:]
-        result: list[dict[str, Any]] = []
-        for item in items:
-            ts = float(item.get("ts", 0.0) or 0.0)
-            ts_iso = None
-            if ts:
-                ts_iso = datetime.fromtimestamp(ts).isoformat(timespec="milliseconds")
-            result.append(
-                dict(
-                    ts=ts_iso,
-                    raw=str(item.get("raw", "")),
-                    parsed=bool(item.get("parsed", False)),
-                    grams=item.get("grams"),
-                    raw_counts=item.get("raw_counts"),
-                    stable_hint=item.get("stable_hint"),
-                    event=item.get("event"),
-                )
-            )
-        return result
+        # Timestamps are formatted once in _append_log, so a poll only copies
+        # references to the newest ``limit`` rows (in C under the GIL, so no
+        # lock) and then turns those rows into dicts.
+        items = list(islice(reversed(self._raw_log), limit))
+        items.reverse()
+        return [item.as_dict() for item in items]
 
     # ------------------------------------------------------------------
     def _loop(self) -> None:
+        # Bound once: the loop runs per wake-up for the life of the process.
+        # _rxbuf is only ever mutated in place, so the local stays valid.
+        monotonic = time.monotonic
+        wall_clock = time.time
+        read_chunk = self._read_chunk
+        take_frames = self._take_frames
+        handle_frames = self._handle_frames
+        rxbuf = self._rxbuf
+        stopped = self._stop_event.wait
         backoff = 1.0
         while self.running:
             if not self._ensure_serial():
-                time.sleep(backoff)
+                if stopped(backoff):
+                    break
                 backoff = min(backoff * 2.0, 10.0)
                 continue
 
             backoff = 1.0
             try:
-                line = self._serial.read_until(
-                    expected=self.frame_terminator,
-                    size=self.frame_max_bytes,
-                )
-                if not line:
-                    self._emit_idle_event()
-                    continue
-                try:
-                    text = line.decode("ascii", errors="ignore").strip()
-                except Exception:
-                    continue
-                if not text:
-                    self._emit_idle_event()
-                    continue
-                self._note_data_received()
-                log_entry: dict[str, Any] = {"ts": time.time(), "raw": text}
-                parsed = self._parse_line(text)
-                if parsed is None:
-                    log_entry["parsed"] = False
+                chunk = read_chunk(self._serial)
+                if not self.running:
+                    break
+                # One clock reading per wake-up: monotonic for intervals, wall
+                # clock only for log timestamps.
+                now = monotonic()
+                wall = wall_clock()
+                if chunk:
+                    rxbuf += chunk
+                    frames = take_frames()
+                elif rxbuf:
+                    # Nothing else arrived before the timeout: hand over the partial
+                    # frame, as read_until() would have.
+                    frames = [bytes(rxbuf)]
+                    rxbuf.clear()
                 else:
-                    _grams, raw_counts, stable_hint = parsed
-                    display_g = self._update(raw_counts, stable_hint)
-                    log_entry.update(
-                        parsed=True,
-                        grams=display_g,
-                        raw_counts=raw_counts,
-                        stable_hint=stable_hint,
-                    )
-                self._append_log(log_entry)
+                    self._emit_idle_event(now, wall)
+                    continue
+                handle_frames(frames, now, wall)
             except serial.SerialException as exc:
-                self._append_log({"event": f"Serial exception: {exc}", "ts": time.time()})
+                self.bad_reads += 1
+                self._append_log(event=f"Serial exception: {exc}")
                 self._reset_serial()
-                time.sleep(backoff)
+                if stopped(backoff):
+                    break
                 backoff = min(backoff * 2.0, 10.0)
             except Exception as exc:
-                self._append_log({"event": f"Parse error: {exc}", "ts": time.time()})
+                self.bad_reads += 1
+                self._append_log(event=f"Parse error: {exc}")
+                continue
+
+    def _read_chunk(self, ser: serial.Serial) -> bytes:
+        """Wait up to ``timeout`` for input and return everything available.
+
+        POSIX ports are waited on with a poll object registered when the port
+        opens and drained with one os.read(), so a burst costs a single syscall
+        and stop() can interrupt the wait. Ports without a file descriptor fall
+        back to pyserial's read().
+        """
+        poller = self._poller
+        if poller is None:
+            return ser.read(max(1, ser.in_waiting))
+        fd = self._serial_fd
+        wake = self._wake_r
+        ready = {event_fd for event_fd, _mask in poller.poll(self._poll_timeout_ms)}
+        if wake in ready:
+            try:
+                while os.read(wake, 64):
+                    pass
+            except BlockingIOError:
+                pass
+            return b""
+        if fd not in ready:
+            return b""
+        try:
+            data = os.read(fd, 4096)
+        except BlockingIOError:
+            return b""
+        except OSError as exc:
+            raise serial.SerialException(f"read failed: {exc}") from exc
+        if not data:
+            # Same signal pyserial uses for an unplugged USB adapter.
+            raise serial.SerialException(
+                "device reports readiness to read but returned no data"
+            )
+        return data
+
+    def _register_poller(self, ser: serial.Serial) -> None:
+        """Set up the poll object for a freshly opened port, if it has an fd."""
+        self._poller = None
+        self._serial_fd = None
+        if not hasattr(select, "poll"):
+            return
+        try:
+            fd = ser.fileno()
+        except (AttributeError, OSError, ValueError):
+            return
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        poller.register(self._wake_r, select.POLLIN)
+        self._serial_fd = fd
+        self._poller = poller
+
+    def _take_frames(self) -> list[bytes]:
+        """Split complete frames off the front of the receive buffer.
+
+        A frame ends at the terminator, or after ``frame_max_bytes`` when no
+        terminator shows up in time; whatever is left stays buffered.
+        """
+        buf = self._rxbuf
+        term = self.frame_terminator
+        max_bytes = self.frame_max_bytes
+        frames: list[bytes] = []
+        start = 0
+        with memoryview(buf) as view:
+            while start < len(buf):
+                idx = buf.find(term, start, start + max_bytes)
+                if idx != -1:
+                    end = idx + len(term)
+                elif len(buf) - start >= max_bytes:
+                    end = start + max_bytes
+                else:
+                    break
+                frames.append(bytes(view[start:end]))
+                start = end
+        if start:
+            del buf[:start]
+        return frames
+
+    def _handle_frames(self, frames: list[bytes], now: float, wall: float) -> None:
+        """Log every frame of a burst but feed only the newest reading to _update.
+
+        Frames drained together were superseded before anyone could see them,
+        so the older ones are logged with their raw counts and skip the window.
+        """
+        rows: list[tuple[dict[str, Any], tuple[float, bool | None] | None]] = []
+        for line in frames:
+            text = line.decode("ascii", errors="ignore").strip()
+            if not text:
+                self._emit_idle_event(now, wall)
+                continue
+            self._note_data_received(now)
+            try:
+                parsed = self._parse_frame(line)
+                if parsed is None:
+                    parsed = self._parse_line(text)
+            except Exception as exc:
+                self.bad_reads += 1
+                rows.append(({"event": f"Parse error: {exc}", "ts": wall}, None))
                 continue
+            rows.append(({"ts": wall, "raw": text}, parsed))
+
+        newest = -1
+        for idx, (_entry, parsed) in enumerate(rows):
+            if parsed is not None:
+                newest = idx
+        for idx, (entry, parsed) in enumerate(rows):
+            if "event" in entry:
+                pass
+            elif parsed is None:
+                entry["parsed"] = False
+            else:
+                grams, stable_hint = parsed
+                entry.update(parsed=True, stable_hint=stable_hint)
+                if idx != newest:
+                    # Superseded: logged with its weight, but kept out of the window.
+                    calibrated, raw_counts = self._calibrate(grams)
+                    entry.update(grams=self._round_display(calibrated), raw_counts=raw_counts)
+                else:
+                    try:
+                        display_g, raw_counts = self._update(grams, stable_hint, now)
+                    except Exception as exc:
+                        self.bad_reads += 1
+                        entry = {"event": f"Parse error: {exc}", "ts": wall}
+                    else:
+                        entry.update(grams=display_g, raw_counts=raw_counts)
+            self._append_log(**entry)
 
     def _ensure_serial(self) -> bool:
         with self._serial_lock:
@@ -261,6 +530,8 @@ class ScaleReader:
                     dsrdtr=self.dsrdtr,
                 )
                 self._serial.reset_input_buffer()
+                self._rxbuf.clear()
+                self._register_poller(self._serial)
                 if self.set_dtr:
                     try:
                         self._serial.dtr = True
@@ -271,16 +542,11 @@ class ScaleReader:
                         self._serial.rts = True
                     except Exception:
                         pass
-                self._append_log(
-                    {
-                        "event": f"Opened {self.serial_port} @ {self.baudrate} baud",
-                        "ts": time.time(),
-                    }
-                )
+                self._append_log(event=f"Opened {self.serial_port} @ {self.baudrate} baud")
                 return True
             except serial.SerialException as exc:
                 self._serial = None
-                self._append_log({"event": f"Serial open failed: {exc}", "ts": time.time()})
+                self._append_log(event=f"Serial open failed: {exc}")
                 return False
 
     def _reset_serial(self) -> None:
@@ -291,92 +557,126 @@ class ScaleReader:
                 except Exception:
                     pass
             self._serial = None
-            self._append_log({"event": "Serial connection closed", "ts": time.time()})
+            self._poller = None
+            self._rxbuf.clear()
+            self._append_log(event="Serial connection closed")
 
     # ------------------------------------------------------------------
-    def _emit_idle_event(self) -> None:
-        now = time.time()
+    def _emit_idle_event(self, now: float, wall: float) -> None:
         if self._last_data_ts is None:
             self._last_data_ts = now
             return
         if (now - self._last_data_ts) < max(self.timeout, 0.5):
             return
-        self._append_log(
-            {
-                "event": f"No serial data for {now - self._last_data_ts:.1f}s",
-                "ts": now,
-            }
-        )
+        self._append_log(event=f"No serial data for {now - self._last_data_ts:.1f}s", ts=wall)
         self._last_data_ts = now
 
-    def _parse_line(self, text: str) -> tuple[float, int, bool | None] | None:
-        """Return (grams, raw_counts, stable_hint) if line parsed; else None."""
-        clean_text = "".join(
-            ch for ch in text if (ch.isprintable() or ch in {"\r", "\n", "\t"})
-        )
-        working_text = clean_text or text
-        tokens = [tok.strip() for tok in self._LINE_SPLIT_RE.split(working_text) if tok.strip()]
+    def _parse_line(self, text: str) -> tuple[float, bool | None] | None:
+        """Return (grams, stable_hint) if line parsed; else None.
+
+        General parser for anything the ``_parse_frame`` fast path rejects.
+        """
+        if text.isprintable():
+            working_text = text
+        else:
+            clean_text = "".join(
+                ch for ch in text if (ch.isprintable() or ch in {"\r", "\n", "\t"})
+            )
+            working_text = clean_text or text
+        # Tokens come back upper-cased; units and markers are matched without
+        # regard to case and the numbers are unaffected.
+        tokens = self._TOKEN_RE.findall(working_text.upper())
         if not tokens:
             return None
 
         stable_hint: bool | None = None
         for tok in tokens:
-            upper = tok.upper()
-            if upper.startswith("US") or "UNSTABLE" in upper:
+            if tok.startswith("US") or "UNSTABLE" in tok:
                 stable_hint = False
                 break
-            if upper.startswith("ST") or "STABLE" in upper:
+            if tok.startswith("ST") or "STABLE" in tok:
                 stable_hint = True
 
         grams = self._extract_grams(working_text, tokens)
         if grams is None:
             return None
+        return grams, stable_hint
 
-        raw_counts = int(round(grams * self.native_counts_per_gram))
-        return grams, raw_counts, stable_hint
+    def _parse_frame(self, buf: bytes) -> tuple[float, bool] | None:
+        """Fast path for the streaming ``ST,GS,  0.000kg`` frame shape.
+
+        Works on the raw frame bytes, before any decoding or tokenising.
+        Returns None for anything that is not exactly status, mode and a number
+        with a kg/g/lb/oz suffix, leaving those lines to ``_parse_line``.
+        """
+        parts = buf.split(b",")
+        if len(parts) != 3:
+            return None
+        status = parts[0].strip().upper()
+        if status not in self._B140_STATUS or parts[1].strip().upper() not in self._B140_MODES:
+            return None
+        field = parts[2].strip().lower()
+        suffix = field[-2:]
+        if suffix in self._B140_UNITS:
+            number = field[:-2].rstrip()
+            unit = suffix.decode()
+        elif field.endswith(b"g"):
+            number = field[:-1].rstrip()
+            unit = "g"
+        else:
+            return None
+        if not number or not self._B140_NUMBER_CHARS.issuperset(number):
+            return None
+        try:
+            value = float(number)
+        except ValueError:
+            return None
+        return value * self._unit_factors[unit], status == b"ST"
 
     def _extract_grams(self, text: str, tokens: list[str]) -> float | None:
-        """Attempt to extract a numeric weight in grams from the raw text."""
+        """Attempt to extract a numeric weight in grams from the raw text.
+
+        ``tokens`` are the upper-cased tokens already produced by ``_parse_line``.
+        """
 
         kg_factor = self.kg_to_grams
 
+        unit_factors = self._unit_factors
+
         def _apply_unit(value: float, unit: str) -> float:
-            unit = unit.lower()
-            if unit.startswith("kg") or "kilogram" in unit:
-                return value * kg_factor
-            if unit.startswith("lb") or "pound" in unit:
-                return value * 453.59237
-            if unit.startswith("oz") or "ounce" in unit:
-                return value * 28.349523125
-            return value
+            return value * unit_factors.get(unit.lower(), 1.0)
 
         # 0) If this is a "Net" line from the verbose printout, only use that value.
-        net_match = self._NET_VALUE_RE.search(text)
-        if net_match:
-            try:
-                value = float(net_match.group(1))
-            except (TypeError, ValueError):
-                pass
-            else:
-                unit = net_match.group(2)
-                if unit:
-                    return _apply_unit(value, unit)
-                fallback_unit = self.net_default_unit
-                if fallback_unit == "auto":
-                    text_upper = text.upper()
-                    if "KG" in text_upper or "KILOGRAM" in text_upper:
-                        fallback_unit = "kg"
-                    elif any(token in text_upper for token in ("LB", "LBS", "POUND", "POUNDS")):
-                        fallback_unit = "lb"
-                    elif any(token in text_upper for token in ("OZ", "OZS", "OUNCE", "OUNCES")):
-                        fallback_unit = "oz"
-                    else:
-                        fallback_unit = "g"
-                return _apply_unit(value, fallback_unit)
-
-        # If the frame includes other verbose ticket fields (Gross, Tare, etc.) but no
-        # usable Net value, ignore it so we do not treat those as live weights.
-        if self._VERBOSE_FIELD_RE.search(text):
+        #    If the frame includes other verbose ticket fields (Gross, Tare, etc.)
+        #    but no usable Net value, ignore it so we do not treat those as live
+        #    weights.
+        text_upper = text.upper()
+        verbose_field = False
+        ticket_fields = (
+            self._TICKET_FIELD_RE.finditer(text)
+            if any(marker in text_upper for marker in self._TICKET_MARKERS)
+            else ()
+        )
+        for field in ticket_fields:
+            if field.group("verbose"):
+                verbose_field = True
+                continue
+            value = float(field.group("net_value"))
+            unit = field.group("net_unit")
+            if unit:
+                return _apply_unit(value, unit)
+            fallback_unit = self.net_default_unit
+            if fallback_unit == "auto":
+                if "KG" in text_upper or "KILOGRAM" in text_upper:
+                    fallback_unit = "kg"
+                elif "LB" in text_upper or "POUND" in text_upper:
+                    fallback_unit = "lb"
+                elif "OZ" in text_upper or "OUNCE" in text_upper:
+                    fallback_unit = "oz"
+                else:
+                    fallback_unit = "g"
+            return _apply_unit(value, fallback_unit)
+        if verbose_field:
             return None
 
         # 1) Prefer explicit number+unit pair anywhere in the text.
@@ -392,9 +692,8 @@ class ScaleReader:
 
         # 2) Look for tokens that embed units (e.g. "1.23Kg", "2lb").
         for token in tokens:
-            lower = token.lower()
-            for unit in ("kg", "kilogram", "lb", "pound", "oz", "ounce", "g", "gram"):
-                idx = lower.find(unit)
+            for unit in ("KG", "KILOGRAM", "LB", "POUND", "OZ", "OUNCE", "G", "GRAM"):
+                idx = token.find(unit)
                 if idx == -1:
                     continue
                 number_part = token[:idx] if idx > 0 else token[idx + len(unit) :]
@@ -412,11 +711,9 @@ class ScaleReader:
                 return _apply_unit(value, unit)
 
         # 3) If the unit is in its own token, use neighbouring numeric token.
-        upper_tokens = [tok.upper() for tok in tokens]
-        for idx, tok in enumerate(upper_tokens):
-            if tok not in {"KG", "KGS", "KILOGRAM", "KILOGRAMS", "LB", "LBS", "POUND", "POUNDS", "OZ", "OZS", "OUNCE", "OUNCES", "G", "GRAM", "GRAMS"}:
+        for idx, unit_token in enumerate(tokens):
+            if unit_token not in {"KG", "KGS", "KILOGRAM", "KILOGRAMS", "LB", "LBS", "POUND", "POUNDS", "OZ", "OZS", "OUNCE", "OUNCES", "G", "GRAM", "GRAMS"}:
                 continue
-            unit_token = tokens[idx]
             neighbours = []
             if idx > 0:
                 neighbours.append(tokens[idx - 1])
@@ -443,12 +740,12 @@ class ScaleReader:
         elif self.net_default_unit == "oz":
             default_multiplier = 28.349523125
 
-        upper_tokens = [tok.upper() for tok in tokens]
-        if any(tok in {"G", "GRAM", "GRAMS"} for tok in upper_tokens):
+        token_set = set(tokens)
+        if not token_set.isdisjoint(self._GRAM_TOKENS):
             default_multiplier = 1.0
-        elif any(tok in {"LB", "LBS", "POUND", "POUNDS"} for tok in upper_tokens):
+        elif not token_set.isdisjoint(self._POUND_TOKENS):
             default_multiplier = 453.59237
-        elif any(tok in {"OZ", "OZS", "OUNCE", "OUNCES"} for tok in upper_tokens):
+        elif not token_set.isdisjoint(self._OUNCE_TOKENS):
             default_multiplier = 28.349523125
 
         for token in tokens:
@@ -472,46 +769,120 @@ class ScaleReader:
 
         return None
 
-    def _update(self, raw_counts: int, stable_hint: bool | None) -> float:
-        with self._state_lock:
-            zero_offset = self._zero_offset
-            scale_factor = self._scale_factor
-            scale_sign = self._scale_sign
-
-        grams = scale_sign * (raw_counts - zero_offset) / scale_factor
-
-        self.window.append(grams)
-        med = median(self.window) if self.window else grams
-        self.ema = med if self.ema is None else (self.alpha * med + (1 - self.alpha) * self.ema)
-
-        computed_stable = (
-            len(self.window) >= max(5, self.window.maxlen // 2)
-            and pstdev(self.window) < 0.05
-        )
+    def _calibrate(self, parsed_grams: float) -> tuple[float, int]:
+        """Return (calibrated grams, raw counts) for one parsed reading."""
+        raw_counts = round(parsed_grams * self.native_counts_per_gram)
+        zero_offset, _factor, scale_sign, scale_inv, identity = self._calibration
+        if identity:
+            return parsed_grams, raw_counts
+        return scale_sign * (raw_counts - zero_offset) * scale_inv, raw_counts
+
+    def _round_display(self, grams: float) -> float:
+        inv_precision = self._inv_precision
+        # Round half up to the display step; dividing by the inverse keeps
+        # decimal steps such as 0.1 free of float residue (12.3, not 12.300000000000001).
+        return math.floor(grams * inv_precision + 0.5) / inv_precision
+
+    def _update(
+        self, parsed_grams: float, stable_hint: bool | None, now: float | None = None
+    ) -> tuple[float, int]:
+        """Feed one parsed reading; return (display grams, raw counts)."""
+        grams, raw_counts = self._calibrate(parsed_grams)
+
+        window = self._window
+        size = self._window_size
+        ordered = self._window_sorted
+        count = self._window_count
+        slot = count % size
+        if count >= size:
+            evicted = window[slot]
+            del ordered[bisect_left(ordered, evicted)]
+            self._window_sum -= evicted
+            self._window_sumsq -= evicted * evicted
+        window[slot] = grams
+        insort(ordered, grams)
+        count += 1
+        self._window_count = count
+        if count % size == 0:
+            # Re-anchor the running sums once per window to stop float drift.
+            self._window_sum = math.fsum(window)
+            self._window_sumsq = math.fsum(x * x for x in window)
+        else:
+            self._window_sum += grams
+            self._window_sumsq += grams * grams
+
+        n = len(ordered)
+        mid = n // 2
+        med = ordered[mid] if n & 1 else (ordered[mid - 1] + ordered[mid]) / 2.0
+        ema = self.ema
+        if ema is None:
+            self.ema = med
+        else:
+            alpha, keep = self._ema_weights
+            self.ema = alpha * med + keep * ema
+
+        computed_stable = False
+        if n >= self._stable_min_n:
+            mean = self._window_sum / n
+            variance = max(self._window_sumsq / n - mean * mean, 0.0)
+            # Population stdev below 0.05 g, compared squared to skip the sqrt.
+            computed_stable = variance < 0.0025
         stable = stable_hint if stable_hint is not None else computed_stable
 
-        precision = self.display_precision if self.display_precision > 0 else 0.1
-        g_display = round(round(grams / precision) * precision, 3)
+        g_display = self._round_display(grams)
 
-        with self._state_lock:
-            self.latest = dict(g=g_display, stable=stable, raw=int(raw_counts))
-            self._last_raw_counts = int(raw_counts)
-            self._last_update_ts = time.time()
-            self._last_data_ts = self._last_update_ts
+        # Each published field is a single atomic store (or deque append), and
+        # only this thread writes them, so no lock is needed.
+        snapshot = Latest(g_display, stable, raw_counts)
+        self.latest = snapshot
+        ts = time.monotonic() if now is None else now
+        self._recent_raw.append((ts, raw_counts))
+        self._last_data_ts = ts
 
-        return g_display
+        for listener in self._listeners:
+            listener(snapshot)
+        return g_display, raw_counts
 
-    def _append_log(self, entry: dict[str, Any]) -> None:
-        item = dict(entry)
-        item.setdefault("ts", time.time())
-        with self._state_lock:
-            self._raw_log.append(item)
+    def _append_log(
+        self,
+        *,
+        ts: float | None = None,
+        raw: str = "",
+        parsed: bool = False,
+        grams: float | None = None,
+        raw_counts: int | None = None,
+        stable_hint: bool | None = None,
+        event: str | None = None,
+    ) -> None:
+        if ts is None:
+            ts = time.time()
+        item = _LogEntry(
+            self._format_ts(ts) if ts else None,
+            raw,
+            parsed,
+            grams,
+            raw_counts,
+            stable_hint,
+            event,
+        )
+        # deque.append is atomic and maxlen trims the oldest row in the same call.
+        self._raw_log.append(item)
+
+    def _format_ts(self, ts: float) -> str:
+        """Local ISO-8601 time with milliseconds, like isoformat(timespec="milliseconds")."""
+        # Split and round the same way datetime.fromtimestamp does.
+        frac, whole = math.modf(ts)
+        sec, usec = divmod(int(whole) * 1_000_000 + round(frac * 1_000_000), 1_000_000)
+        # Rows arrive several times a second, so the formatted second is reused.
+        cached_sec, prefix = self._ts_cache
+        if sec != cached_sec:
+            prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(sec))
+            self._ts_cache = (sec, prefix)
+        return f"{prefix}.{usec // 1000:03d}"
 
     # ------------------------------------------------------------------
-    def _note_data_received(self) -> None:
-        now = time.time()
-        with self._state_lock:
-            self._last_data_ts = now
+    def _note_data_received(self, now: float) -> None:
+        self._last_data_ts = now
 
     # ------------------------------------------------------------------
     @staticmethod
@@ -559,13 +930,6 @@ class ScaleReader:
         }
         return mapping.get(value, serial.STOPBITS_ONE)
 
-    @staticmethod
-    def _coerce_terminator(value: str) -> bytes:
-        decoded = value.encode("utf-8", errors="ignore").decode("unicode_escape")
-        if not decoded:
-            decoded = "\r"
-        return decoded.encode("utf-8", errors="ignore")
-
     @staticmethod
     def _coerce_net_unit(value: str | None) -> str:
         if not value:
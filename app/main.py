@@ -1,17 +1,24 @@
-import asyncio, csv, io, os, math
+import asyncio, csv, io, json, os, math
 import logging
+from contextlib import asynccontextmanager
+from collections.abc import Callable
+from functools import cache, lru_cache
 from typing import Any, Dict, List, Optional, Set, Tuple
 from pathlib import Path
+from time import monotonic
 from datetime import date, datetime, timedelta, time
+from anyio import to_thread
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, Request, Path as FPath
 from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
-from sqlalchemy import create_engine, select, func, case, or_, cast, String
+from sqlalchemy import create_engine, event, insert, select, update, func, case, or_, cast, String
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from app.models import Base, Variant, Calibration, WeighEvent, Colour
-from app.hx711_reader import ScaleReader, ADCNotReadyError
+from app.hx711_reader import ScaleReader, ADCNotReadyError, _env_int
 from app.filters import DriftFilter  # added for drift filter
 DRIFT_FILTER = DriftFilter()  # singleton drift filter
 # --- Paths (absolute so systemd WorkingDirectory issues don't blank the page)
@@ -20,10 +27,39 @@ ROOT_DIR = BASE_DIR.parent
 DATA_DIR = ROOT_DIR / "data"
 STATIC_DIR = BASE_DIR / "static"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
+logger = logging.getLogger(__name__)
 # --- App & DB
-engine = create_engine(f"sqlite:///{DATA_DIR}/weigh.db", future=True, connect_args={"check_same_thread": False})
+# QueuePool keeps a few connections (and their WAL/shm mappings) open across
+# requests instead of reopening the file each time. No pre-ping/recycle: a local
+# SQLite file has no server to drop idle connections.
+engine = create_engine(
+    f"sqlite:///{DATA_DIR}/weigh.db",
+    future=True,
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=5,
+    max_overflow=10,
+)
 Session = sessionmaker(engine, expire_on_commit=False, future=True)
-Base.metadata.create_all(engine)
+
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _record) -> None:
+    # WAL lets a commit fsync only the log and lets readers run alongside the
+    # writer; synchronous=NORMAL is crash-safe in WAL mode (a power cut can lose
+    # the last commit, never corrupt the file).
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA mmap_size=134217728")
+    cur.execute("PRAGMA cache_size=-20000")
+    cur.close()
+
+
+# True once weigh_events.serial has a UNIQUE index, i.e. SQLite itself rejects
+# duplicate serials; set by _ensure_schema_migrations().
+_serial_unique = False
 
 
 def _ensure_schema_migrations() -> None:
@@ -38,11 +74,20 @@ def _ensure_schema_migrations() -> None:
     }
 
     with engine.begin() as conn:
+        # Tables and their columns in one round-trip; a table without columns
+        # still appears once thanks to the LEFT JOIN.
+        table_columns: dict[str, set[str]] = {}
+        for table, column in conn.exec_driver_sql(
+            "SELECT m.name, p.name FROM sqlite_master AS m "
+            "LEFT JOIN pragma_table_info(m.name) AS p "
+            "WHERE m.type = 'table' AND m.name IN ('colours', 'weigh_events', 'variants')"
+        ):
+            cols = table_columns.setdefault(table, set())
+            if column is not None:
+                cols.add(column)
+
         # Ensure the dedicated colours lookup table exists for the settings UI.
-        colours_table = conn.exec_driver_sql(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='colours'"
-        ).fetchone()
-        if not colours_table:
+        if "colours" not in table_columns:
             conn.exec_driver_sql(
                 """
                 CREATE TABLE colours (
@@ -52,33 +97,77 @@ def _ensure_schema_migrations() -> None:
                 """
             )
 
-        existing_weigh_event_cols = {
-            row[1]
-            for row in conn.exec_driver_sql("PRAGMA table_info(weigh_events)").fetchall()
-        }
+        existing_weigh_event_cols = table_columns.get("weigh_events", set())
         for column, ddl in weigh_event_columns.items():
             if column not in existing_weigh_event_cols:
                 conn.exec_driver_sql(
                     f"ALTER TABLE weigh_events ADD COLUMN {column} {ddl}"
                 )
 
-        variant_columns = {
-            row[1]
-            for row in conn.exec_driver_sql("PRAGMA table_info(variants)").fetchall()
-        }
+        variant_columns = table_columns.get("variants", set())
         if "enabled" not in variant_columns:
             conn.exec_driver_sql(
                 "ALTER TABLE variants ADD COLUMN enabled BOOLEAN DEFAULT 1"
             )
 
+        # Indexes declared on WeighEvent after the table was first created.
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_weigh_events_ts ON weigh_events (ts)"
+        )
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_weigh_events_variant_ts "
+            "ON weigh_events (variant_id, ts)"
+        )
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_weigh_events_moulding_serial "
+            "ON weigh_events (moulding_serial)"
+        )
+
+        # Serial lookups back the duplicate check on every commit. Older
+        # databases may already hold duplicate serials, in which case the index
+        # can only be a plain one and the commit endpoint keeps enforcing
+        # uniqueness for new rows. A plain index left by an earlier start is
+        # upgraded once the duplicates are gone.
+        global _serial_unique
+        index_unique = {
+            row[1]: bool(row[2])
+            for row in conn.exec_driver_sql("PRAGMA index_list(weigh_events)").fetchall()
+        }
+        _serial_unique = index_unique.get("ix_weigh_events_serial", False)
+        if not _serial_unique:
+            if "ix_weigh_events_serial" in index_unique:
+                conn.exec_driver_sql("DROP INDEX ix_weigh_events_serial")
+            try:
+                conn.exec_driver_sql(
+                    "CREATE UNIQUE INDEX ix_weigh_events_serial ON weigh_events (serial)"
+                )
+                _serial_unique = True
+            except IntegrityError:
+                logger.warning("Duplicate serials found; creating a non-unique serial index")
+                conn.exec_driver_sql(
+                    "CREATE INDEX ix_weigh_events_serial ON weigh_events (serial)"
+                )
+
 
-_ensure_schema_migrations()
+def _size_threadpool() -> None:
+    # Plain ``def`` endpoints (all the DB and export routes) run on AnyIO's
+    # worker threads so they never block the event loop that drives the
+    # WebSocket; WEB_THREADS caps how many may run at once.
+    tokens = _env_int("WEB_THREADS", 40)
+    to_thread.current_default_thread_limiter().total_tokens = max(1, tokens)
 
 
-logger = logging.getLogger(__name__)
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    # Startup: size the threadpool (needs the running loop), then set up the
+    # database and start the reader; shutdown: stop the reader thread.
+    _size_threadpool()
+    _boot()
+    yield
+    reader.stop()
 
 
-app = FastAPI(title="Weigh Station")
+app = FastAPI(title="Weigh Station", lifespan=_lifespan)
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
 
@@ -189,6 +278,19 @@ def _parse_dt_param(value: Optional[str], *, is_start: bool) -> Optional[datetim
             raise HTTPException(400, "Invalid date format. Use YYYY-MM-DD or ISO 8601 timestamps.") from exc
         boundary = time.min if is_start else time.max
         return datetime.combine(parsed_date, boundary)
+
+
+def _parse_iso_date(value: str | None, label: str) -> date | None:
+    if value in (None, ""):
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(400, f"{label} must be YYYY-MM-DD")
+
+
+def _midnight(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day)
 # --- Pydantic DTOs
 class VariantIn(BaseModel):
     name: str = Field(..., max_length=64)
@@ -229,60 +331,137 @@ class WeighEventListOut(BaseModel):
     count: int
     has_more: bool = False
     errors: List[str] = Field(default_factory=list)
+# --- Placeholder variants seeded into an empty database (adjust in UI)
+_DEFAULT_VARIANTS = (
+    {"name": "Variant A", "min_g": 95.0, "max_g": 105.0},
+    {"name": "Variant B", "min_g": 145.0, "max_g": 155.0},
+    {"name": "Variant C", "min_g": 48.0, "max_g": 52.0},
+    {"name": "Variant D", "min_g": 10.0, "max_g": 12.0},
+)
 # --- Scale reader boot
 reader = ScaleReader()  # pin names via env: DATA_PIN, CLOCK_PIN
-with Session() as s:
-    calib = s.execute(select(Calibration).order_by(Calibration.id.desc())).scalar()
-    native_scale = reader.native_counts_per_gram
-    if calib:
-        stored_scale = float(calib.scale_factor or 0)
-        stored_zero = int(calib.zero_offset or 0)
-        if stored_scale <= 0:
-            reader.set_calibration(0, native_scale)
-        else:
-            ratio = stored_scale / native_scale if native_scale else 1.0
-            if 0.5 <= ratio <= 2.0:
-                reader.set_calibration(stored_zero, stored_scale)
-            else:
+
+
+def _boot() -> None:
+    # Schema, calibration and seed data are set up when the server starts
+    # rather than on import, reading calibration and seeding in one session.
+    Base.metadata.create_all(engine)
+    _ensure_schema_migrations()
+    with Session() as s, s.begin():
+        calib = s.execute(
+            select(Calibration).order_by(Calibration.id.desc()).limit(1)
+        ).scalar()
+        native_scale = reader.native_counts_per_gram
+        if calib:
+            stored_scale = float(calib.scale_factor or 0)
+            stored_zero = int(calib.zero_offset or 0)
+            if stored_scale <= 0:
                 reader.set_calibration(0, native_scale)
-    else:
-        reader.set_calibration(0, native_scale)
-reader.start(hz=10)
-# --- Seed 4 variants if empty (placeholders; adjust in UI)
-with Session() as s:
-    if s.query(Variant).count() == 0:
-        s.add_all([
-            Variant(name="Variant A", min_g=95.0, max_g=105.0),
-            Variant(name="Variant B", min_g=145.0, max_g=155.0),
-            Variant(name="Variant C", min_g=48.0,  max_g=52.0),
-            Variant(name="Variant D", min_g=10.0,  max_g=12.0),
-        ])
-        s.commit()
+            else:
+                ratio = stored_scale / native_scale if native_scale else 1.0
+                if 0.5 <= ratio <= 2.0:
+                    reader.set_calibration(stored_zero, stored_scale)
+                else:
+                    reader.set_calibration(0, native_scale)
+        else:
+            reader.set_calibration(0, native_scale)
+        # --- Seed 4 variants if empty (one executemany INSERT)
+        if s.execute(select(func.count()).select_from(Variant)).scalar() == 0:
+            s.execute(insert(Variant), list(_DEFAULT_VARIANTS))
+    reader.start(hz=10)
 # --- Web pages
+@cache
+def _page(name: str) -> HTMLResponse:
+    # Pages ship with the app and only change on a deploy (which restarts the
+    # service), so each is read once and its response, with the body already
+    # encoded and the headers built, is handed out as is to every request.
+    return HTMLResponse((STATIC_DIR / name).read_text(encoding="utf-8"))
 @app.get("/", response_class=HTMLResponse)
 def index():
-    return (STATIC_DIR / "index.html").read_text(encoding="utf-8")
+    return _page("index.html")
 @app.get("/settings", response_class=HTMLResponse)
 def settings():
-    return (STATIC_DIR / "settings.html").read_text(encoding="utf-8")
+    return _page("settings.html")
 
 @app.get("/production", response_class=HTMLResponse)
 def production_output_page():
-    return (STATIC_DIR / "production.html").read_text(encoding="utf-8")
+    return _page("production.html")
 
 @app.get("/export", response_class=HTMLResponse)
 def export_page():
-    return (STATIC_DIR / "export.html").read_text(encoding="utf-8")
+    return _page("export.html")
 
 
 @app.get("/serial-log", response_class=HTMLResponse)
 def serial_log_page():
-    return (STATIC_DIR / "serial-log.html").read_text(encoding="utf-8")
+    return _page("serial-log.html")
+# --- Stats response cache
+# Dashboards poll the stats endpoints every few seconds, but their inputs only
+# change when weigh events or variants are written. Responses are reused for
+# _STATS_TTL seconds, and every such write calls _bump_data_epoch(), which
+# empties the cache; the epoch stops a computation that raced with the write
+# from caching its result.
+_STATS_TTL = 5.0
+_STATS_CACHE_MAX = 64
+_stats_cache: dict[tuple, tuple[float, dict]] = {}
+_data_epoch = 0
+
+
+def _bump_data_epoch() -> None:
+    global _data_epoch
+    _data_epoch += 1
+    _stats_cache.clear()
+
+
+def _cached_stats(key: tuple, compute: Callable[[], dict]) -> dict:
+    now = monotonic()
+    hit = _stats_cache.get(key)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+    epoch = _data_epoch
+    result = compute()
+    if epoch == _data_epoch:
+        if len(_stats_cache) >= _STATS_CACHE_MAX:
+            _stats_cache.clear()
+        _stats_cache[key] = (now + _STATS_TTL, result)
+    return result
+
+
 # --- Variant CRUD
+# (name, min_g, max_g) per variant id for the commit hot path. Every write to
+# the variants table calls _invalidate_variant_cache(); the epoch stops a
+# lookup that raced with such a write from caching what it read before it.
+_variant_cache: dict[int, tuple[str, float, float]] = {}
+_variant_cache_epoch = 0
+
+
+def _invalidate_variant_cache() -> None:
+    global _variant_cache_epoch
+    _variant_cache_epoch += 1
+    _variant_cache.clear()
+    _bump_data_epoch()  # spec limits feed the stats responses
+
+
+def _variant_info(s, variant_id: int) -> tuple[str, float, float] | None:
+    info = _variant_cache.get(variant_id)
+    if info is None:
+        epoch = _variant_cache_epoch
+        v = s.get(Variant, variant_id)
+        if v is None:
+            return None
+        info = (v.name, v.min_g, v.max_g)
+        if epoch == _variant_cache_epoch:
+            _variant_cache[variant_id] = info
+    return info
+
+
 @app.get("/api/variants", response_model=List[VariantOut])
 def list_variants():
     with Session() as s:
-        vs = s.query(Variant).order_by(Variant.id.asc()).all()
+        vs = s.execute(
+            select(Variant.id, Variant.name, Variant.min_g, Variant.max_g, Variant.unit, Variant.enabled)
+            .order_by(Variant.id.asc())
+        ).all()
         return [VariantOut(id=v.id, name=v.name, min_g=v.min_g, max_g=v.max_g, unit=v.unit, enabled=v.enabled) for v in vs]
 
 
@@ -343,6 +522,7 @@ def create_variant(v: VariantIn):
     with Session() as s:
         row = Variant(name=v.name, min_g=v.min_g, max_g=v.max_g, unit=v.unit, enabled=v.enabled)
         s.add(row); s.commit(); s.refresh(row)
+        _invalidate_variant_cache()
         return VariantOut(id=row.id, **v.model_dump())
 @app.put("/api/variants/{variant_id}", response_model=VariantOut)
 def update_variant(variant_id: int = FPath(..., ge=1), v: VariantIn = ...):
@@ -351,6 +531,7 @@ def update_variant(variant_id: int = FPath(..., ge=1), v: VariantIn = ...):
         if not row: raise HTTPException(404, "Variant not found")
         for k, val in v.model_dump().items(): setattr(row, k, val)
         s.commit(); s.refresh(row)
+        _invalidate_variant_cache()
         return VariantOut(id=row.id, name=row.name, min_g=row.min_g, max_g=row.max_g, unit=row.unit, enabled=row.enabled)
 @app.delete("/api/variants/{variant_id}")
 def delete_variant(variant_id: int = FPath(..., ge=1)):
@@ -358,17 +539,17 @@ def delete_variant(variant_id: int = FPath(..., ge=1)):
         row = s.get(Variant, variant_id)
         if not row: raise HTTPException(404, "Variant not found")
         s.delete(row); s.commit()
+    _invalidate_variant_cache()
     return {"ok": True}
 
 
 @app.get("/api/colours", response_model=List[ColourOut])
 def list_colours():
     with Session() as s:
-        rows = (
-            s.query(Colour)
+        rows = s.execute(
+            select(Colour.id, Colour.name)
             .order_by(func.lower(Colour.name).asc(), Colour.id.asc())
-            .all()
-        )
+        ).all()
         return [ColourOut(id=row.id, name=row.name) for row in rows]
 
 
@@ -439,7 +620,7 @@ def tare():
     except ADCNotReadyError as exc:
         raise HTTPException(503, "Scale is busy; please try again.") from exc
     calib = reader.get_calibration()
-    signed_scale = calib["scale_factor"] * calib.get("scale_sign", 1)
+    signed_scale = calib.scale_factor * calib.scale_sign
     with Session() as s:
         c = Calibration(zero_offset=raw, scale_factor=signed_scale, notes="tare")
         s.add(c); s.commit()
@@ -452,27 +633,74 @@ def calibrate_with_known(known_g: float = Query(..., gt=0.0)):
     except ADCNotReadyError as exc:
         raise HTTPException(503, "Scale is busy; please try again.") from exc
     calib = reader.get_calibration()
-    counts = raw - calib["zero_offset"]
+    counts = raw - calib.zero_offset
     if abs(counts) < 10:
         raise HTTPException(400, "Detected weight change is too small; place the known mass on the platform before calibrating.")
     k = counts / known_g  # counts per gram
     with Session() as s:
-        c = Calibration(zero_offset=calib["zero_offset"], scale_factor=k, notes=f"M={known_g}g")
+        c = Calibration(zero_offset=calib.zero_offset, scale_factor=k, notes=f"M={known_g}g")
         s.add(c); s.commit()
-    reader.set_calibration(calib["zero_offset"], k)
+    reader.set_calibration(calib.zero_offset, k)
     return {"scale_factor": k}
 # --- Live weight over WebSocket
+# The reader thread encodes each new reading once and hands it to the event loop,
+# which fans the same text out to every connected client's queue.
+_ws_loop: asyncio.AbstractEventLoop | None = None
+_ws_subscribers: set[asyncio.Queue] = set()
+
+
+@lru_cache(maxsize=1)
+def _encode_latest(g: float, stable: bool, raw: int) -> str:
+    # Cached on the reading itself: the broadcast and every client's idle
+    # resend of the same reading share one encoded string.
+    return json.dumps({"g": g, "stable": stable, "raw": raw}, separators=(",", ":"))
+
+
+def _broadcast_reading(payload: str) -> None:
+    for q in _ws_subscribers:
+        if q.full():
+            # Client still sending the previous frame: replace its pending
+            # reading, so a backlog coalesces into one frame of the newest value.
+            q.get_nowait()
+        q.put_nowait(payload)
+
+
+def _on_reading(latest) -> None:
+    loop = _ws_loop
+    if loop is None or not _ws_subscribers:
+        return
+    try:
+        loop.call_soon_threadsafe(_broadcast_reading, _encode_latest(*latest))
+    except RuntimeError:
+        pass  # event loop already closed during shutdown
+
+
+reader.add_listener(_on_reading)
+
+
 @app.websocket("/ws/weight")
 async def ws_weight(ws: WebSocket):
+    global _ws_loop
     await ws.accept()
+    _ws_loop = asyncio.get_running_loop()
+    q: asyncio.Queue = asyncio.Queue(maxsize=1)
+    _ws_subscribers.add(q)
     try:
+        await ws.send_text(_encode_latest(*reader.latest))
         while True:
-            await asyncio.sleep(0.1)  # ~10 Hz UI refresh
-            await ws.send_json(reader.read_latest())
+            try:
+                payload = await asyncio.wait_for(q.get(), timeout=1.0)
+            except asyncio.TimeoutError:  # builtin TimeoutError only from 3.11
+                # Scale is quiet: resend the current value so the UI stays live
+                # and a vanished client is noticed.
+                payload = _encode_latest(*reader.latest)
+            await ws.send_text(payload)
     except WebSocketDisconnect:
         pass
     except Exception:
         await ws.close()
+    finally:
+        _ws_subscribers.discard(q)
 # --- Commit a weighing (now enforces non-blank + unique serial)
 @app.post("/api/weigh/commit", response_model=WeighEventOut)
 def commit(
@@ -506,19 +734,24 @@ def commit(
     colour_clean = _clean(colour)
     notes_clean = _clean(notes, preserve_newlines=True)
     with Session() as s:
-        # Enforce global uniqueness of serial across all variants unless overwrite requested
-        dup = s.query(WeighEvent).filter(WeighEvent.serial == serial).first()
-        if dup and not overwrite:
+        # Enforce global uniqueness of serial across all variants unless overwrite
+        # requested. Checked before the reading goes through DRIFT_FILTER, so a
+        # rejected duplicate leaves the filter untouched; an indexed probe.
+        dup_id = s.execute(
+            select(WeighEvent.id).where(WeighEvent.serial == serial).limit(1)
+        ).scalar()
+        if dup_id is not None and not overwrite:
             raise HTTPException(
                 status_code=409,
-                detail={"message": "Serial already used.", "id": dup.id},
+                detail={"message": "Serial already used.", "id": dup_id},
             )
-        v = s.get(Variant, variant_id)
-        if not v:
+        variant_info = _variant_info(s, variant_id)
+        if variant_info is None:
             raise HTTPException(404, "Variant not found")
+        variant_name, min_g, max_g = variant_info
         latest = reader.read_latest()
         g = float(latest.get("g", 0.0))
-        in_range = (v.min_g <= g <= v.max_g)
+        in_range = (min_g <= g <= max_g)
         net_g = float(DRIFT_FILTER.update(g))
         raw_avg = int(latest.get("raw", 0))
         payload = dict(
@@ -535,33 +768,49 @@ def commit(
             in_range=in_range,
             raw_avg=raw_avg,
         )
-        if dup:
-            for key, value in payload.items():
-                setattr(dup, key, value)
-            dup.ts = datetime.utcnow()
+        if dup_id is not None:
+            # Overwrite in place with one UPDATE ... RETURNING; no ORM load/refresh.
+            evt_id, evt_ts = s.execute(
+                update(WeighEvent)
+                .where(WeighEvent.id == dup_id)
+                .values(**payload, ts=datetime.utcnow())
+                .returning(WeighEvent.id, WeighEvent.ts)
+            ).one()
             s.commit()
-            s.refresh(dup)
-            evt = dup
+            _bump_data_epoch()
         else:
-            evt = WeighEvent(**payload)
-            s.add(evt)
+            stmt = sqlite_insert(WeighEvent).values(**payload).returning(WeighEvent.id, WeighEvent.ts)
+            if _serial_unique:
+                stmt = stmt.on_conflict_do_nothing(index_elements=[WeighEvent.serial])
+            inserted = s.execute(stmt).first()
+            if inserted is None:
+                # Serial committed by a concurrent request since the probe above.
+                s.rollback()
+                existing_id = s.execute(
+                    select(WeighEvent.id).where(WeighEvent.serial == serial).limit(1)
+                ).scalar()
+                raise HTTPException(
+                    status_code=409,
+                    detail={"message": "Serial already used.", "id": existing_id},
+                )
             s.commit()
-            s.refresh(evt)
-        normalized_result, result_label = _normalize_in_range(evt.in_range)
+            _bump_data_epoch()
+            evt_id, evt_ts = inserted
+        normalized_result, result_label = _normalize_in_range(in_range)
         return WeighEventOut(
-            id=evt.id,
-            ts=evt.ts.isoformat(),
-            variant_id=evt.variant_id,
-            variant_name=v.name,
-            moulding_serial=evt.moulding_serial,
-            serial=evt.serial,
-            contract=evt.contract,
-            order_number=evt.order_number,
-            operator=evt.operator,
-            colour=evt.colour,
-            notes=evt.notes,
-            gross_g=evt.gross_g,
-            net_g=evt.net_g,
+            id=evt_id,
+            ts=evt_ts.isoformat(),
+            variant_id=variant_id,
+            variant_name=variant_name,
+            moulding_serial=moulding_clean,
+            serial=serial,
+            contract=contract_clean,
+            order_number=order_clean,
+            operator=operator_clean,
+            colour=colour_clean,
+            notes=notes_clean,
+            gross_g=g,
+            net_g=net_g,
             in_range=normalized_result,
             result_label=result_label,
         )
@@ -575,9 +824,7 @@ def stats(
     offset_minutes = int(tz_offset or 0)
     offset_delta = timedelta(minutes=offset_minutes)
 
-    now_local = datetime.utcnow() - offset_delta
-    today_local = now_local.date()
-    start_local = datetime.combine(today_local, time.min)
+    start_local = _midnight((datetime.utcnow() - offset_delta).date())
     end_local = start_local + timedelta(days=1)
     start_dt = start_local + offset_delta
     end_dt = end_local + offset_delta
@@ -604,22 +851,15 @@ def stats(
 
 @app.get("/api/operators", response_model=List[str])
 def list_operators():
+    # Trim and de-duplicate in SQL so " bob" and "bob" come back once.
+    name = func.trim(WeighEvent.operator)
     with Session() as s:
-        rows = (
-            s.query(WeighEvent.operator)
-            .filter(WeighEvent.operator.isnot(None), WeighEvent.operator != "")
+        return s.scalars(
+            select(name)
+            .where(WeighEvent.operator.isnot(None), name != "")
             .distinct()
-            .order_by(WeighEvent.operator.asc())
-            .all()
-        )
-    cleaned: List[str] = []
-    seen: Set[str] = set()
-    for row in rows:
-        name = (row[0] or "").strip()
-        if name and name not in seen:
-            seen.add(name)
-            cleaned.append(name)
-    return cleaned
+            .order_by(name.asc())
+        ).all()
 
 @app.get("/api/production/output")
 def production_output(
@@ -633,16 +873,8 @@ def production_output(
     if interval not in {"day", "hour"}:
         raise HTTPException(400, "interval must be 'day' or 'hour'")
 
-    def parse_iso_date(value: Optional[str], label: str):
-        if value in (None, ""):
-            return None
-        try:
-            return datetime.strptime(value, "%Y-%m-%d").date()
-        except ValueError:
-            raise HTTPException(400, f"{label} must be YYYY-MM-DD")
-
-    start_date = parse_iso_date(start, "start")
-    end_date = parse_iso_date(end, "end")
+    start_date = _parse_iso_date(start, "start")
+    end_date = _parse_iso_date(end, "end")
     offset_minutes = int(tz_offset or 0)
     offset_delta = timedelta(minutes=offset_minutes)
 
@@ -654,8 +886,8 @@ def production_output(
     if start_date > end_date:
         raise HTTPException(400, "start must be on or before end")
 
-    start_local = datetime.combine(start_date, time.min)
-    end_local = datetime.combine(end_date + timedelta(days=1), time.min)
+    start_local = _midnight(start_date)
+    end_local = _midnight(end_date + timedelta(days=1))
     start_dt = start_local + offset_delta
     end_dt = end_local + offset_delta
 
@@ -679,12 +911,6 @@ def production_output(
             bucket_labels.append(current_dt.strftime("%Y-%m-%d %H:00"))
             current_dt += timedelta(hours=1)
 
-    def _bucket_label(ts_local: datetime) -> str:
-        if interval == "day":
-            return ts_local.strftime("%Y-%m-%d")
-        aligned = ts_local.replace(minute=0, second=0, microsecond=0)
-        return aligned.strftime("%Y-%m-%d %H:00")
-
     def _classify(value: Optional[object]) -> Optional[bool]:
         if value is None:
             return None
@@ -708,7 +934,7 @@ def production_output(
         variant_options = _collect_production_variants(s)
         variants_by_id = {
             row.id: (row.name or "").strip() or f"Variant {row.id}"
-            for row in s.query(Variant).all()
+            for row in s.execute(select(Variant.id, Variant.name))
         }
 
         if variant_id is not None:
@@ -717,71 +943,83 @@ def production_output(
                 raise HTTPException(404, "Variant not found")
             variant_meta = {"id": variant.id, "name": variant.name}
 
-        q = (
-            s.query(WeighEvent)
-            .filter(WeighEvent.ts >= start_dt, WeighEvent.ts < end_dt)
-            .order_by(WeighEvent.ts.asc())
-        )
-
+        filters = [WeighEvent.ts >= start_dt, WeighEvent.ts < end_dt]
         if variant_id is not None:
-            q = q.filter(WeighEvent.variant_id == variant_id)
+            filters.append(WeighEvent.variant_id == variant_id)
 
-        rows: List[WeighEvent] = q.all()
+        # Bucket counts are grouped in SQL on the local-time label, so only one
+        # row per bucket comes back however many events the range holds.
+        label_fmt = "%Y-%m-%d" if interval == "day" else "%Y-%m-%d %H:00"
+        label_expr = func.strftime(label_fmt, WeighEvent.ts, f"{-offset_minutes} minutes")
+        bucket_rows = s.execute(
+            select(
+                label_expr,
+                func.count(),
+                func.sum(case((_pass_condition_expr(), 1), else_=0)),
+            )
+            .where(*filters)
+            .group_by(label_expr)
+        ).all()
 
-    bucket_totals: Dict[str, Dict[str, int]] = {
-        label: {"pass": 0, "fail": 0, "total": 0} for label in bucket_labels
+        event_limit = 500
+        # One row past the limit tells whether the list was truncated.
+        rows = s.execute(
+            select(
+                WeighEvent.ts,
+                WeighEvent.variant_id,
+                WeighEvent.serial,
+                WeighEvent.moulding_serial,
+                WeighEvent.contract,
+                WeighEvent.order_number,
+                WeighEvent.operator,
+                WeighEvent.colour,
+                WeighEvent.notes,
+                WeighEvent.net_g,
+                WeighEvent.in_range,
+            )
+            .where(*filters)
+            .order_by(WeighEvent.ts.asc())
+            .limit(event_limit + 1)
+        ).all()
+
+    bucket_totals: Dict[str, Tuple[int, int]] = {
+        label: (int(total), int(passed or 0)) for label, total, passed in bucket_rows
     }
+    query_count = sum(total for total, _passed in bucket_totals.values())
 
     total_pass = 0
     total_fail = 0
     total_count = 0
 
-    event_limit = 500
+    events_truncated = len(rows) > event_limit
     events_payload: List[dict] = []
-    events_truncated = False
-
-    for idx, row in enumerate(rows):
-        local_ts = row.ts - offset_delta
-        label = _bucket_label(local_ts)
-        bucket = bucket_totals.setdefault(label, {"pass": 0, "fail": 0, "total": 0})
-        bucket["total"] += 1
+    for row in rows[:event_limit]:
         status = _classify(row.in_range)
-        if status is True:
-            bucket["pass"] += 1
-        elif status is False:
-            bucket["fail"] += 1
-
-        if idx < event_limit:
-            events_payload.append(
-                {
-                    "ts": local_ts.isoformat(),
-                    "variant_id": row.variant_id,
-                    "variant": variants_by_id.get(
-                        row.variant_id, f"Variant {row.variant_id}" if row.variant_id else "—"
-                    ),
-                    "serial": row.serial,
-                    "moulding_serial": row.moulding_serial,
-                    "contract": row.contract,
-                    "order_number": row.order_number,
-                    "operator": row.operator,
-                    "colour": row.colour,
-                    "notes": row.notes,
-                    "net_g": row.net_g,
-                    "status": "pass" if status is True else "fail" if status is False else None,
-                }
-            )
-        else:
-            events_truncated = True
+        events_payload.append(
+            {
+                "ts": (row.ts - offset_delta).isoformat(),
+                "variant_id": row.variant_id,
+                "variant": variants_by_id.get(
+                    row.variant_id, f"Variant {row.variant_id}" if row.variant_id else "—"
+                ),
+                "serial": row.serial,
+                "moulding_serial": row.moulding_serial,
+                "contract": row.contract,
+                "order_number": row.order_number,
+                "operator": row.operator,
+                "colour": row.colour,
+                "notes": row.notes,
+                "net_g": row.net_g,
+                "status": "pass" if status is True else "fail" if status is False else None,
+            }
+        )
 
     bucket_data: List[dict] = []
 
     for label in bucket_labels:
-        bucket = bucket_totals.get(label) or {"pass": 0, "fail": 0, "total": 0}
-        total = int(bucket.get("total", 0) or 0)
-        passed = int(bucket.get("pass", 0) or 0)
-        # Ensure unknown results still surface as fails so totals match the row count
-        explicit_fail = int(bucket.get("fail", 0) or 0)
-        fail = max(explicit_fail, total - passed)
+        total, passed = bucket_totals.get(label, (0, 0))
+        # Unknown results still surface as fails so totals match the row count
+        fail = total - passed
         rate = (passed / total) if total else None
         bucket_data.append(
             {
@@ -812,7 +1050,7 @@ def production_output(
             "total": total_count or (total_pass + total_fail),
             "pass_rate": overall_rate,
         },
-        "query_count": len(rows),
+        "query_count": query_count,
         "events": events_payload,
         "events_truncated": events_truncated,
         "events_limit": event_limit,
@@ -834,51 +1072,66 @@ def export_csv(
     end_dt = _parse_dt_param(to, is_start=False)
     if start_dt and end_dt and end_dt < start_dt:
         raise HTTPException(400, '"to" must be on or after "from".')
-    output = io.StringIO()
-    w = csv.writer(output)
-    w.writerow(
-        [
-            "ts",
-            "variant_id",
-            "moulding_serial",
-            "serial",
-            "contract",
-            "order_number",
-            "operator",
-            "colour",
-            "notes",
-            "gross_g",
-            "net_g",
-            "in_range",
-            "raw_avg",
-        ]
+    header = [
+        "ts",
+        "variant_id",
+        "moulding_serial",
+        "serial",
+        "contract",
+        "order_number",
+        "operator",
+        "colour",
+        "notes",
+        "gross_g",
+        "net_g",
+        "in_range",
+        "raw_avg",
+    ]
+    q = select(
+        WeighEvent.ts,
+        WeighEvent.variant_id,
+        WeighEvent.moulding_serial,
+        WeighEvent.serial,
+        WeighEvent.contract,
+        WeighEvent.order_number,
+        WeighEvent.operator,
+        WeighEvent.colour,
+        # Flatten line breaks in SQL; NULLs stay NULL and csv writes them as "".
+        func.replace(func.replace(WeighEvent.notes, "\r", " "), "\n", " "),
+        WeighEvent.gross_g,
+        WeighEvent.net_g,
+        WeighEvent.in_range,
+        WeighEvent.raw_avg,
     )
-    with Session() as s:
-        q = s.query(WeighEvent)
-        if variant: q = q.filter(WeighEvent.variant_id == variant)
-        if operator: q = q.filter(WeighEvent.operator == operator)
-        if start_dt: q = q.filter(WeighEvent.ts >= start_dt)
-        if end_dt: q = q.filter(WeighEvent.ts <= end_dt)
-        for r in q.order_by(WeighEvent.ts.asc()).all():
-            w.writerow(
-                [
-                    r.ts.isoformat(),
-                    r.variant_id,
-                    r.moulding_serial or "",
-                    r.serial,
-                    r.contract or "",
-                    r.order_number or "",
-                    r.operator or "",
-                    r.colour or "",
-                    (r.notes or "").replace("\r", " ").replace("\n", " "),
-                    r.gross_g,
-                    r.net_g,
-                    r.in_range,
-                    r.raw_avg,
-                ]
-            )
-    output.seek(0)
-    return StreamingResponse(output, media_type="text/csv",
+    if variant: q = q.where(WeighEvent.variant_id == variant)
+    if operator: q = q.where(WeighEvent.operator == operator)
+    if start_dt: q = q.where(WeighEvent.ts >= start_dt)
+    if end_dt: q = q.where(WeighEvent.ts <= end_dt)
+    q = q.order_by(WeighEvent.ts.asc()).execution_options(yield_per=500)
+
+    def generate():
+        # Rows are fetched and written in batches, so memory stays flat and the
+        # download starts before the whole table has been read.
+        output = io.StringIO()
+        w = csv.writer(output)
+        w.writerow(header)
+        # Send the header before the query runs so the download starts at once.
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate()
+        with Session() as s:
+            for rows in s.execute(q).partitions():
+                # Only ts needs converting in Python; the C csv writer quotes the
+                # text columns and writes None as "" in one call per batch.
+                w.writerows([(r[0].isoformat(), *r[1:]) for r in rows])
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+        chunk = output.getvalue()
+        if chunk:
+            yield chunk
+
+    return StreamingResponse(generate(), media_type="text/csv",
                              headers={"Content-Disposition": "attachment; filename=weigh_export.csv"})
 
 
@@ -1072,6 +1325,7 @@ def delete_export_event(event_id: int):
             raise HTTPException(404, "Event not found")
         s.delete(evt)
         s.commit()
+    _bump_data_epoch()
     return {"ok": True, "id": event_id}
 # Debug: latest reading (for polling fallback / quick checks)
 @app.get("/api/debug/latest")
@@ -1085,7 +1339,7 @@ def api_serial_log(limit: int = Query(200, ge=1, le=2000)):
 # --- Health
 @app.get("/api/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "scale_bad_reads": reader.bad_reads}
 # --- Admin: delete data (use with care)
 @app.post("/api/admin/delete-events")
 def delete_all_events(confirm: str = Query(..., description='Type "DELETE" to confirm')):
@@ -1094,36 +1348,33 @@ def delete_all_events(confirm: str = Query(..., description='Type "DELETE" to co
     with Session() as s:
         s.query(WeighEvent).delete()
         s.commit()
+    _bump_data_epoch()
     return {"ok": True, "deleted": "weigh_events"}
 @app.post("/api/admin/factory-reset")
 def factory_reset(confirm: str = Query(..., description='Type "RESET" to confirm')):
     if confirm != "RESET":
         raise HTTPException(400, 'Confirmation failed. Pass ?confirm=RESET to proceed.')
-    with Session() as s:
+    # Wipe and reseed in one transaction, so a failure leaves the data intact.
+    with Session() as s, s.begin():
         s.query(WeighEvent).delete()
         s.query(Calibration).delete()
         s.query(Variant).delete()
         s.query(Colour).delete()
-        s.commit()
         # Reseed 4 defaults so the UI has something to select
-        s.add_all([
-            Variant(name="Variant A", min_g=95.0, max_g=105.0),
-            Variant(name="Variant B", min_g=145.0, max_g=155.0),
-            Variant(name="Variant C", min_g=48.0,  max_g=52.0),
-            Variant(name="Variant D", min_g=10.0,  max_g=12.0),
-        ])
-        s.commit()
+        s.execute(insert(Variant), list(_DEFAULT_VARIANTS))
+    _invalidate_variant_cache()
     return {"ok": True, "reset": True}
 # --- Stats Page
 @app.get("/stats", response_class=HTMLResponse)
 def stats_page():
-    return (STATIC_DIR / "stats.html").read_text(encoding="utf-8")
+    return _page("stats.html")
 # --- Stats summary (histogram + Cp/Cpk etc.)
-from statistics import mean, stdev
-from math import erf, sqrt
+from math import erfc, sqrt
+_INV_SQRT2 = 1.0 / sqrt(2.0)
 def _ncdf(x: float) -> float:
-    # standard normal CDF
-    return 0.5 * (1.0 + erf(x / sqrt(2.0)))
+    # standard normal CDF; erfc keeps the far tails (ppm level) accurate where
+    # 1 + erf(x) would cancel to 0
+    return 0.5 * erfc(-x * _INV_SQRT2)
 @app.get("/api/stats/summary")
 def stats_summary(
     variant_id: int,
@@ -1132,31 +1383,39 @@ def stats_summary(
     to: Optional[str] = None,
     moulding_serial: Optional[str] = None,
 ):
+    key = ("summary", variant_id, bins, frm, to, moulding_serial)
+    return _cached_stats(key, lambda: _stats_summary(variant_id, bins, moulding_serial))
+
+
+def _stats_summary(variant_id: int, bins: int, moulding_serial: str | None) -> dict:
     # fetch variant & measurements
     with Session() as s:
         v = s.get(Variant, variant_id)
         if not v:
             raise HTTPException(404, "Variant not found")
-        q = s.query(WeighEvent).filter(WeighEvent.variant_id == variant_id)
+        conds = [WeighEvent.variant_id == variant_id]
         serial_filter = (moulding_serial or "").strip()
         if serial_filter:
-            q = q.filter(WeighEvent.moulding_serial == serial_filter)
+            conds.append(WeighEvent.moulding_serial == serial_filter)
         # (MVP) frm/to are placeholders; extend to parse ISO dates if needed
-        rows = q.order_by(WeighEvent.ts.asc()).all()
-        xs = [r.net_g for r in rows]
+        # One SELECT of (net_g, in_range) so every figure below comes from the
+        # same snapshot; only those two columns are loaded.
+        rows = s.execute(select(WeighEvent.net_g, WeighEvent.in_range).where(*conds)).all()
+        xs = [x for x, _ok in rows]
         n = len(xs)
-        passes = sum(1 for r in rows if r.in_range)
+        passes = sum(1 for _x, ok in rows if ok)
         fails  = n - passes
         # base stats
-        mu = float(mean(xs)) if n else 0.0
-        sigma = float(stdev(xs)) if n >= 2 else 0.0  # overall (sample) stdev
+        mu = math.fsum(xs) / n if n else 0.0
+        # overall (sample) stdev
+        sigma = sqrt(math.fsum((x - mu) ** 2 for x in xs) / (n - 1)) if n >= 2 else 0.0
         lsl, usl = float(v.min_g), float(v.max_g)
         cp = (usl - lsl) / (6.0 * sigma) if sigma > 0 else None
         z_low  = (mu - lsl) / sigma if sigma > 0 else None
         z_high = (usl - mu) / sigma if sigma > 0 else None
         cpk = min(z_low, z_high) / 3.0 if (z_low is not None and z_high is not None) else None
         ppm_l = _ncdf((lsl - mu) / sigma) * 1e6 if sigma > 0 else None
-        ppm_u = (1.0 - _ncdf((usl - mu) / sigma)) * 1e6 if sigma > 0 else None
+        ppm_u = _ncdf((mu - usl) / sigma) * 1e6 if sigma > 0 else None
         ppm_total = (ppm_l or 0.0) + (ppm_u or 0.0) if sigma > 0 else None
         # histogram
         if n:
@@ -1184,8 +1443,6 @@ def stats_summary(
         }
 # ---------- Distribution + Cp/Cpk ----------
 from math import sqrt, floor, ceil
-def _parse_day(d: str) -> datetime:
-    return datetime.strptime(d, "%Y-%m-%d")
 @app.get("/api/stats/distribution")
 def stats_distribution(
     variant_id: int | None = Query(None),
@@ -1194,6 +1451,19 @@ def stats_distribution(
     moulding_serial: str | None = Query(None),
     bins: int = Query(20, ge=5, le=200),
 ):
+    key = ("distribution", variant_id, frm, to, moulding_serial, bins)
+    return _cached_stats(
+        key, lambda: _stats_distribution(variant_id, frm, to, moulding_serial, bins)
+    )
+
+
+def _stats_distribution(
+    variant_id: int | None,
+    frm: str | None,
+    to: str | None,
+    moulding_serial: str | None,
+    bins: int,
+) -> dict:
     # Need a single variant for Cp/Cpk (LSL/USL)
     if not variant_id:
         raise HTTPException(400, "variant_id is required for Cp/Cpk")
@@ -1201,16 +1471,29 @@ def stats_distribution(
         v = s.get(Variant, int(variant_id))
         if not v:
             raise HTTPException(404, "Variant not found")
-        q = s.query(WeighEvent).filter(WeighEvent.variant_id == int(variant_id))
-        if frm:
-            q = q.filter(WeighEvent.ts >= _parse_day(frm))
-        if to:
-            q = q.filter(WeighEvent.ts < (_parse_day(to) + timedelta(days=1)))
+        q = select(WeighEvent.ts, WeighEvent.net_g).where(
+            WeighEvent.variant_id == int(variant_id)
+        )
+        frm_date = _parse_iso_date(frm, "frm")
+        to_date = _parse_iso_date(to, "to")
+        if frm_date:
+            q = q.where(WeighEvent.ts >= _midnight(frm_date))
+        if to_date:
+            q = q.where(WeighEvent.ts < _midnight(to_date + timedelta(days=1)))
         serial_filter = (moulding_serial or "").strip()
         if serial_filter:
-            q = q.filter(WeighEvent.moulding_serial == serial_filter)
-        rows = q.order_by(WeighEvent.ts.asc()).all()
-        vals = [float(r.net_g) for r in rows]
+            q = q.where(WeighEvent.moulding_serial == serial_filter)
+        q = q.order_by(WeighEvent.ts.asc()).execution_options(yield_per=2000)
+        # One streamed pass over (ts, net_g) tuples builds both the value list
+        # and the control series; no Row list is held for the whole range.
+        vals: list[float] = []
+        control_series: list[dict] = []
+        add_val = vals.append
+        add_point = control_series.append
+        for ts, net_g in s.execute(q):
+            x = float(net_g)
+            add_val(x)
+            add_point({"ts": ts.isoformat(), "value": round(x, 4)})
         n = len(vals)
         if n == 0:
             return {
@@ -1223,20 +1506,22 @@ def stats_distribution(
                 "unit": v.unit,
             }
         # basic stats
-        s1 = sum(vals)
-        mean = s1 / n
-        s2 = sum((x - mean) ** 2 for x in vals)
+        mean = math.fsum(vals) / n
+        s2 = math.fsum((x - mean) ** 2 for x in vals)
         stdev = sqrt(s2 / (n - 1)) if n > 1 else 0.0
-        lo = min(vals); hi = max(vals)
+        vmin = min(vals); vmax = max(vals)
+        lo = vmin; hi = vmax
         if lo == hi:  # widen a touch so we can draw a bar
             lo -= 0.5; hi += 0.5
         # histogram
         edges = [lo + (hi - lo) * i / bins for i in range(bins + 1)]
         counts = [0] * bins
+        span = hi - lo
+        last = bins - 1
         for x in vals:
             # last edge goes to last bin
-            idx = min(bins - 1, max(0, int((x - lo) / (hi - lo) * bins)))
-            counts[idx] += 1
+            idx = int((x - lo) / span * bins)
+            counts[min(last, idx)] += 1
         lsl = float(v.min_g)
         usl = float(v.max_g)
         passed = sum(1 for x in vals if (lsl <= x <= usl))
@@ -1258,23 +1543,9 @@ def stats_distribution(
             lcl = mean
         def rd(x, d=4):
             return None if x is None else (round(x, d))
-        def _control_value(row: WeighEvent) -> float | None:
-            if row.net_g is not None:
-                return rd(float(row.net_g), 4)
-            if row.gross_g is not None:
-                return rd(float(row.gross_g), 4)
-            return None
-
-        control_series = [
-            {
-                "ts": r.ts.isoformat(),
-                "value": _control_value(r),
-            }
-            for r in rows
-        ]
         return {
             "count": n, "mean": rd(mean,4), "stdev": rd(stdev,4),
-            "min": rd(min(vals),4), "max": rd(max(vals),4),
+            "min": rd(vmin,4), "max": rd(vmax,4),
             "lsl": rd(lsl,4), "usl": rd(usl,4),
             "cp": rd(cp,3), "cpk": rd(cpk,3),
             "pass": passed, "fail": failed, "yield": rd(yld,4),
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, Integer, Float, Boolean, ForeignKey, DateTime, Text
+from sqlalchemy import String, Integer, Float, Boolean, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 class Base(DeclarativeBase):
@@ -31,11 +31,14 @@ class Colour(Base):
 
 class WeighEvent(Base):
     __tablename__ = "weigh_events"
+    # ts backs the date-range filters of stats and export; (variant_id, ts)
+    # serves the same ranges restricted to one variant.
+    __table_args__ = (Index("ix_weigh_events_variant_ts", "variant_id", "ts"),)
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    ts: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    ts: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
     variant_id: Mapped[int] = mapped_column(ForeignKey("variants.id"))
-    moulding_serial: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
-    serial: Mapped[str] = mapped_column(String(64))
+    moulding_serial: Mapped[Optional[str]] = mapped_column(String(128), nullable=True, index=True)
+    serial: Mapped[str] = mapped_column(String(64), unique=True, index=True)
     contract: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
     order_number: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
     operator: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)